@@ -4,121 +4,290 @@ Launcher for SES Distributed System
 Khởi động 15 processes đồng thời
 """
 
-import subprocess
 import sys
 import time
 import os
 import json
-from pathlib import Path
+import pickle
+import glob
+import select
+import signal
+import struct
+import ctypes
 import threading
 
+# orjson (Rust, SIMD) parse nhanh hơn json stdlib vài lần — optional
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# io_uring binding — optional, cần Linux >= 5.13 + package liburing
+try:
+    import liburing
+except ImportError:
+    liburing = None
+
+
+def _parse_json_file(path):
+    """Parse một file JSON, ưu tiên orjson nếu có"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+# Template JSON dựng sẵn cho config mặc định — ghi blob thẳng ra file,
+# không build dict + json.dump(indent=2). Schema SoA: 2 mảng phẳng
+# ids/ports + 1 host chung thay vì list-of-dicts
+_DEFAULT_NUM_PROCESSES = 15
+_DEFAULT_BASE_PORT = 5000
+_DEFAULT_CONFIG_TEMPLATE = b'''{
+  "num_processes": %d,
+  "messages_per_process": 150,
+  "message_rate": {
+    "min_per_minute": 10,
+    "max_per_minute": 100
+  },
+  "network": {
+    "base_port": %d,
+    "timeout": 30
+  },
+  "logging": {
+    "level": "INFO",
+    "format": "[%%(asctime)s] [%%(levelname)s] %%(message)s"
+  },
+  "host": "localhost",
+  "ids": [%s],
+  "ports": [%s]
+}
+'''
+
+
+def expand_processes(config):
+    """Suy ra config['processes'] từ schema ids/ports cho code cũ"""
+    if 'processes' not in config and 'ids' in config:
+        host = config.get('host', 'localhost')
+        ports = config['ports']
+        config['processes'] = [
+            {'id': i, 'host': host, 'port': ports[i]}
+            for i in config['ids']
+        ]
+    return config
+
+
+class Inotify:
+    """Wrapper mỏng quanh inotify(7) qua ctypes, đủ dùng cho temp_status"""
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+
+    def __init__(self, path, mask):
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = self._libc.inotify_add_watch(self.fd, path.encode(), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, "inotify_add_watch failed")
+
+    def read_events(self):
+        """Đọc hết events đang chờ, trả về list tên file"""
+        try:
+            buf = os.read(self.fd, 4096)
+        except BlockingIOError:
+            return []
+        names = []
+        offset = 0
+        while offset + 16 <= len(buf):
+            wd, mask, cookie, length = struct.unpack_from('iIII', buf, offset)
+            name = buf[offset + 16: offset + 16 + length].rstrip(b'\0').decode()
+            if name:
+                names.append(name)
+            offset += 16 + length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
 
 class ProcessLauncher:
     def __init__(self, config_path="config/config.json"):
         self.config_path = config_path
         self.processes = []
+        # Bind format một lần — template chỉ bị tokenize lúc bind,
+        # f-string thì parse lại mỗi lần gọi trên hot path
+        self._row_fmt = "Process {:<6} {:<8} {:<10} {:>3}%".format
+        self._live_count = 0
+        self._sig_r = None
+        self._logs_mtime = None
+        self._logs_cache = None
         self.load_config()
         
     def load_config(self):
-        """Load configuration từ file"""
+        """Load configuration từ file, cache bản đã parse theo mtime"""
         try:
-            with open(self.config_path, 'r') as f:
-                self.config = json.load(f)
-            print(f"✓ Loaded configuration: {self.config['num_processes']} processes")
+            st = os.stat(self.config_path)
         except FileNotFoundError:
             print(f"✗ Config file not found: {self.config_path}")
             print("Creating default config...")
-            self.create_default_config()
-            with open(self.config_path, 'r') as f:
-                self.config = json.load(f)
+            self.config = self.create_default_config()
+            return
+
+        # Cache key đổi khi file đổi → không bao giờ dùng cache cũ
+        cache_path = f"{self.config_path}.{st.st_mtime_ns}.{st.st_size}.pkl"
+        try:
+            with open(cache_path, 'rb') as f:
+                self.config = pickle.load(f)
+            print(f"✓ Loaded configuration (cached): {self.config['num_processes']} processes")
+            return
+        except (FileNotFoundError, pickle.UnpicklingError, EOFError):
+            pass
+
+        self.config = expand_processes(_parse_json_file(self.config_path))
+        print(f"✓ Loaded configuration: {self.config['num_processes']} processes")
+
+        # Chỉ cache sau khi parse thành công
+        try:
+            for old_cache in glob.glob(f"{self.config_path}.*.pkl"):
+                os.unlink(old_cache)
+            with open(cache_path, 'wb') as f:
+                pickle.dump(self.config, f, protocol=5)
+        except OSError:
+            pass
     
     def create_default_config(self):
         """Tạo file config mặc định"""
         os.makedirs('config', exist_ok=True)
-        
-        default_config = {
-            "num_processes": 15,
-            "messages_per_process": 150,
-            "message_rate": {
-                "min_per_minute": 10,
-                "max_per_minute": 100
-            },
-            "network": {
-                "base_port": 5000,
-                "timeout": 30
-            },
-            "logging": {
-                "level": "INFO",
-                "format": "[%(asctime)s] [%(levelname)s] %(message)s"
-            },
-            "processes": []
-        }
-        
-        # Tạo danh sách processes
-        for i in range(default_config["num_processes"]):
-            default_config["processes"].append({
-                "id": i,
-                "host": "localhost",
-                "port": default_config["network"]["base_port"] + i
-            })
-        
-        with open(self.config_path, 'w') as f:
-            json.dump(default_config, f, indent=2)
-        
+
+        n = _DEFAULT_NUM_PROCESSES
+        base = _DEFAULT_BASE_PORT
+        ids_blob = b', '.join(b'%d' % i for i in range(n))
+        ports_blob = b', '.join(b'%d' % (base + i) for i in range(n))
+        blob = _DEFAULT_CONFIG_TEMPLATE % (n, base, ids_blob, ports_blob)
+        with open(self.config_path, 'wb') as f:
+            f.write(blob)
+
         print(f"✓ Created default config at {self.config_path}")
+
+        # File chỉ để persist — config trả về từ blob trong memory,
+        # không re-open + re-parse file vừa ghi
+        parsed = orjson.loads(blob) if orjson is not None else json.loads(blob)
+        return expand_processes(parsed)
     
+    @staticmethod
+    def clean_dir(path, prefix, suffixes):
+        """Xóa files match prefix/suffix: scandir + unlink(dir_fd), không PosixPath"""
+        dir_fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    name = entry.name
+                    if name.startswith(prefix) and name.endswith(suffixes):
+                        os.unlink(name, dir_fd=dir_fd)
+        finally:
+            os.close(dir_fd)
+
     def setup_environment(self):
         """Chuẩn bị môi trường: tạo thư mục logs"""
         os.makedirs('logs', exist_ok=True)
+        os.makedirs('temp_status', exist_ok=True)
         print("✓ Created logs directory")
-        
+
         # Xóa các log files cũ
-        for log_file in Path('logs').glob('process_*.log'):
-            log_file.unlink()
+        self.clean_dir('logs', 'process_', ('.log', '.out'))
         print("✓ Cleaned old log files")
-        for temp_file in Path('temp_status').glob('P*.txt'):
-            temp_file.unlink()
+        self.clean_dir('temp_status', 'P', ('.bin', '.txt', '.tmp'))
         print("✓ Cleaned old temp status files")
-        
-        
+
+
     def launch_process(self, process_id):
-        """Khởi động một process"""
+        """Spawn một process con qua posix_spawn, không fork + COW page table"""
+        # stdout của child trùng với logs/process_N.log (FileHandler trong
+        # child) → vứt vào /dev/null. stderr thì GIỮ ra file riêng: uncaught
+        # traceback chỉ đi qua stderr, không qua FileHandler — bỏ nó là
+        # child chết Exited(1) mà không còn dấu vết nào trên disk
+        file_actions = [
+            (os.POSIX_SPAWN_OPEN, 1, os.devnull,
+             os.O_WRONLY, 0o644),
+            (os.POSIX_SPAWN_OPEN, 2, f"logs/process_{process_id}.out",
+             os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644),
+        ]
         try:
-            # Chạy process trong subprocess
-            process = subprocess.Popen(
+            pid = os.posix_spawn(
+                sys.executable,
                 [sys.executable, '-u', 'single_process.py', str(process_id)],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
+                os.environ,
+                file_actions=file_actions
             )
-            self.processes.append({
-                'id': process_id,
-                'process': process
-            })
-            print(f"✓ Launched Process {process_id} (PID: {process.pid})")
-            return True
-        except Exception as e:
+        except OSError as e:
             print(f"✗ Failed to launch Process {process_id}: {e}")
             return False
-    
 
-    
+        # Mở pidfd để kernel báo thức khi child exit (Linux >= 5.3)
+        try:
+            pidfd = os.pidfd_open(pid)
+        except (AttributeError, OSError):
+            pidfd = None
+
+        # Ghim child vào 1 core riêng (opt-in) → cache residency ổn định,
+        # không bị scheduler xáo qua lại với monitoring loop của launcher
+        if self.config.get('pin_cpus'):
+            ncpu = os.cpu_count() or 1
+            try:
+                os.sched_setaffinity(pid, {1 + process_id % max(1, ncpu - 1)})
+            except (AttributeError, OSError):
+                pass
+        self.processes.append({
+            'id': process_id,
+            'pid': pid,
+            'pidfd': pidfd,
+            'status': None,
+            'progress': 0
+        })
+        self._live_count += 1
+        print(f"✓ Launched Process {process_id} (PID: {pid})")
+        return True
+
+    def proc_poll(self, p_info):
+        """Kiểm tra trạng thái child, cache returncode vào p_info"""
+        if p_info['status'] is None:
+            try:
+                pid, sts = os.waitpid(p_info['pid'], os.WNOHANG)
+                if pid != 0:
+                    p_info['status'] = os.waitstatus_to_exitcode(sts)
+            except ChildProcessError:
+                # Đã được reap ở chỗ khác
+                p_info['status'] = 0
+            if p_info['status'] is not None:
+                self._live_count -= 1
+        return p_info['status']
+
     def launch_all(self):
         """Khởi động tất cả processes"""
         print("\n" + "="*60)
         print("  SES DISTRIBUTED SYSTEM LAUNCHER")
         print("="*60)
         print(f"\nLaunching {self.config['num_processes']} processes...\n")
-        
+
         self.setup_environment()
-        
-        # Khởi động từng process với delay nhỏ
+
+        # Launcher ở yên trên core 0, nhường các core còn lại cho children
+        if self.config.get('pin_cpus'):
+            try:
+                os.sched_setaffinity(0, {0})
+            except (AttributeError, OSError):
+                pass
+
+        # posix_spawn trả về trong vài µs nên spawn tuần tự vẫn ~tức thì
         success_count = 0
         for i in range(self.config['num_processes']):
             if self.launch_process(i):
                 success_count += 1
-            time.sleep(0.2)  # Delay nhỏ để tránh race condition
-        
+
         print(f"\n{'='*60}")
         print(f"✓ Successfully launched {success_count}/{self.config['num_processes']} processes")
         print(f"{'='*60}\n")
@@ -128,83 +297,225 @@ class ProcessLauncher:
         
         return success_count == self.config['num_processes']
     
-    def read_output(self, process_id):
-        process = self.processes[process_id]['process']
-        for line in iter(process.stdout.readline, ''):
-            print(f"[P{process_id}] {line.strip()}")
-    
     def update_process_line(self, p_info, relative_line):
-        pid = p_info['process'].pid
-        status = p_info['process'].poll()
+        pid = p_info['pid']
+        status = self.proc_poll(p_info)
         status_str = "Running" if status is None else f"Exited({status})"
-        new_content = f"Process {p_info['id']:<6} {pid:<8} {status_str:<10}"
-        # print (f"{new_content}")
-
-        # Move cursor, clear line, write content
-    # Save cursor position, move up, update, restore cursor
-        sys.stdout.write("\033[s")  # Save cursor position
-        sys.stdout.write(f"\033[{relative_line}A")  # Move up relative_line lines
-        sys.stdout.write("\033[2K")  # Clear line
-        sys.stdout.write("\r" + new_content)  # Write content at start of line
-        sys.stdout.write("\033[u")  # Restore cursor position
-        sys.stdout.flush()
+        new_content = self._row_fmt(p_info['id'], pid, status_str, p_info['progress'])
+
+        # Gom cả frame (save cursor, move up, clear, content, restore)
+        # thành 1 buffer → 1 syscall thay vì 5 write + flush
+        frame = b''.join((
+            b'\x1b[s',                      # Save cursor position
+            b'\x1b[%dA' % relative_line,    # Move up relative_line lines
+            b'\x1b[2K\r',                   # Clear line, về đầu dòng
+            new_content.encode(),
+            b'\x1b[u',                      # Restore cursor position
+        ))
+        os.write(1, frame)
 
             
-    def scan_loop(self, pid, expected):
-        file_name = f"temp_status/P{pid}.txt"
-        
-        # Wait for file to be created
-        print(f"Thread {pid}: Waiting for {file_name}...")
-        while not os.path.exists(file_name):
-            time.sleep(0.5)
-        
-        print(f"Thread {pid}: File found, starting monitoring...")
-        
-        FLAG = True
-        while FLAG:
+    def read_progress(self, pid):
+        """Đọc đúng 1 giá trị từ binary progress record, seek O(1)"""
+        try:
+            with open(f"temp_status/P{pid}.bin", "rb") as f:
+                f.seek(4 + pid * 8)
+                data = f.read(8)
+        except OSError:
+            return None
+        if len(data) < 8:
+            return None
+        val, = struct.unpack('<d', data)
+        return val
+
+    def handle_progress_event(self, name):
+        """Refresh dòng status của process vừa ghi progress file"""
+        if not (name.startswith('P') and name.endswith('.bin')):
+            return
+        try:
+            pid = int(name[1:-4])
+            p_info = self.processes[pid]
+        except (ValueError, IndexError):
+            return
+
+        val = self.read_progress(pid)
+        if val is not None:
+            expected = self.config['messages_per_process'] * (len(self.processes) - 1) * 2
+            p_info['progress'] = round(val * 100 / expected)
+
+        lines_up = len(self.processes) - pid
+        self.update_process_line(p_info, lines_up)
+
+
+    def monitor_loop(self):
+        if liburing is not None and self.config.get('use_iouring'):
             try:
-                # ĐỌC VÀ ĐÓNG FILE NGAY LẬP TỨC
-                with open(file_name, "r") as f:
-                    line = f.readline().strip().strip("[]")
-                # File đã đóng ở đây!
-                if not line:
-                    time.sleep(1.5)
-                    continue
-                numbers = [float(x) for x in line.split(",")]
-                if numbers[pid] >= expected:
-                    FLAG = False
-                    print(f"Thread {pid}: Reached target {expected}")
-                    print (f"Debug: Final numbers for Process {pid}: {numbers}, progress: {numbers[pid]}/{expected}")
-                    
-                    
-                percent = round(numbers[pid] * 100 / expected)
-                total_process = len(self.processes)
-                lines_up = total_process - pid
-                
-                self.update_process_line(self.processes[pid], lines_up)
-                
-            except (IndexError, ValueError, FileNotFoundError) as e:
+                self.monitor_loop_iouring()
+                return
+            except OSError:
                 pass
-            time.sleep(5)  
-        print(f"Thread {pid}: Monitoring complete")
-        
-        
-    def monitor_loop(self):
+        try:
+            self.monitor_loop_pidfd()
+        except (AttributeError, OSError):
+            # Non-Linux hoặc kernel cũ: fallback về polling
+            self.monitor_loop_polling()
+
+    def monitor_loop_iouring(self):
+        """Chờ child exits + progress + Ctrl+C qua io_uring: batch
+        POLL_ADD cho mọi pidfd, wakeup fd và inotify fd trong 1 lần
+        submit, reap bằng io_uring_wait_cqe"""
+        if any(p['pidfd'] is None for p in self.processes):
+            raise OSError("pidfd not available")
+
+        total_process = len(self.processes)
+        ring = liburing.io_uring()
+        liburing.io_uring_queue_init(32, ring, 0)
+
+        def arm_poll(fd):
+            sqe = liburing.io_uring_get_sqe(ring)
+            liburing.io_uring_prep_poll_add(sqe, fd, select.POLLIN)
+            sqe.user_data = fd
+
+        inot = None
+        try:
+            inot = Inotify('temp_status',
+                           Inotify.IN_MODIFY | Inotify.IN_CLOSE_WRITE
+                           | Inotify.IN_MOVED_TO)
+        except OSError:
+            inot = None
+
+        fd_map = {}
+        interrupted = False
+        try:
+            # Tất cả POLL_ADD đi trong một io_uring_enter duy nhất
+            for p_info in self.processes:
+                arm_poll(p_info['pidfd'])
+                fd_map[p_info['pidfd']] = p_info
+            if inot is not None:
+                arm_poll(inot.fd)
+            if self._sig_r is not None:
+                arm_poll(self._sig_r)
+            liburing.io_uring_submit(ring)
+
+            cqe = liburing.io_uring_cqe()
+            while fd_map and not interrupted:
+                liburing.io_uring_wait_cqe(ring, cqe)
+                fd = cqe.user_data
+                liburing.io_uring_cqe_seen(ring, cqe)
+
+                if fd == self._sig_r:
+                    os.read(self._sig_r, 64)
+                    interrupted = True
+                    continue
+                if inot is not None and fd == inot.fd:
+                    for name in inot.read_events():
+                        self.handle_progress_event(name)
+                    # POLL_ADD là one-shot — arm lại cho event tiếp theo
+                    arm_poll(fd)
+                    liburing.io_uring_submit(ring)
+                    continue
+
+                p_info = fd_map.pop(fd, None)
+                if p_info is None:
+                    continue
+                self.proc_poll(p_info)
+                os.close(p_info['pidfd'])
+                p_info['pidfd'] = None
+                self.update_process_line(p_info, total_process - p_info['id'])
+        finally:
+            if inot is not None:
+                inot.close()
+            liburing.io_uring_queue_exit(ring)
+
+        if interrupted:
+            print("\n\n⚠ Received interrupt signal")
+        else:
+            print("\n\n✓ All processes have finished.")
+        self.shutdown_all()
+
+    def monitor_loop_pidfd(self):
+        """Chờ child exit qua pidfd + epoll, không busy-loop"""
+        total_process = len(self.processes)
+
+        if any(p['pidfd'] is None for p in self.processes):
+            raise OSError("pidfd not available")
+
+        epoll = select.epoll()
+        fd_map = {}  # pidfd → p_info, lookup O(1)
+        for p_info in self.processes:
+            epoll.register(p_info['pidfd'], select.EPOLLIN)
+            fd_map[p_info['pidfd']] = p_info
+
+        # Cùng một epoll theo dõi luôn progress files trong temp_status
+        inot = None
+        try:
+            # IN_MOVED_TO bắt os.replace của child: event cuối cùng mang
+            # tên P<pid>.bin, các event ghi/close chỉ thấy file .tmp
+            inot = Inotify('temp_status',
+                           Inotify.IN_MODIFY | Inotify.IN_CLOSE_WRITE
+                           | Inotify.IN_MOVED_TO)
+            epoll.register(inot.fd, select.EPOLLIN)
+        except OSError:
+            inot = None
+
+        if self._sig_r is not None:
+            epoll.register(self._sig_r, select.EPOLLIN)
+
+        interrupted = False
+        try:
+            while fd_map and not interrupted:
+                for fd, _ in epoll.poll(timeout=-1):
+                    if fd == self._sig_r:
+                        os.read(self._sig_r, 64)
+                        interrupted = True
+                        break
+                    if inot is not None and fd == inot.fd:
+                        for name in inot.read_events():
+                            self.handle_progress_event(name)
+                        continue
+
+                    p_info = fd_map.pop(fd)
+                    # pidfd readable = child đã exit, reap ngay
+                    self.proc_poll(p_info)
+                    epoll.unregister(fd)
+                    os.close(fd)
+                    p_info['pidfd'] = None
+
+                    lines_up = total_process - p_info['id']
+                    self.update_process_line(p_info, lines_up)
+        finally:
+            if inot is not None:
+                inot.close()
+            epoll.close()
+
+        if interrupted:
+            print("\n\n⚠ Received interrupt signal")
+        else:
+            print("\n\n✓ All processes have finished.")
+        self.shutdown_all()
+
+    def monitor_loop_polling(self):
         total_process = len(self.processes)
 
         while True:
-            # Update each process line
+            # Update each process line — proc_poll chạy đúng 1 lần/process
+            # ở đây và cache status vào p_info
             for idx, p_info in enumerate(self.processes):
                 lines_up = total_process - idx
                 self.update_process_line(p_info, lines_up)
 
-            # Check if all processes finished
-            all_finished = all(
-                p['process'].poll() is not None 
-                for p in self.processes
-            )
+            # Ctrl+C tới qua wakeup fd, không qua KeyboardInterrupt
+            if self._sig_r is not None:
+                try:
+                    os.read(self._sig_r, 64)
+                    print("\n\n⚠ Received interrupt signal")
+                    self.shutdown_all()
+                    break
+                except BlockingIOError:
+                    pass
 
-            if all_finished:
+            # Check if all processes finished — counter O(1), không quét lại
+            if self._live_count == 0:
                 print("\n\n✓ All processes have finished.")
                 self.shutdown_all()
                 break
@@ -214,12 +525,20 @@ class ProcessLauncher:
     def monitor_processes(self):
         """Giám sát các processes"""
         print("\nMonitoring processes... Press Ctrl+C to stop all.\n")
-        print(f"{'Process ID':<12} {'PID':<8} {'Status':<10} ")
+        print(f"{'Process ID':<12} {'PID':<8} {'Status':<10} {'Progress':<8}")
         print("-" * 60)
 
         for p_info in self.processes:
-            pid = p_info['process'].pid
-            print(f"Process {p_info['id']:<6} {pid:<8} Running")
+            print(self._row_fmt(p_info['id'], p_info['pid'], "Running", 0))
+
+        # SIGINT đi qua wakeup fd → hiện ra như fd readiness trong epoll,
+        # không cần KeyboardInterrupt + timeout định kỳ
+        sig_r, sig_w = os.pipe()
+        os.set_blocking(sig_r, False)
+        os.set_blocking(sig_w, False)
+        signal.signal(signal.SIGINT, lambda signum, frame: None)
+        old_wakeup = signal.set_wakeup_fd(sig_w)
+        self._sig_r = sig_r
 
         # Start monitor thread
         self.monitor_thread = threading.Thread(
@@ -230,28 +549,86 @@ class ProcessLauncher:
 
         # Let main thread wait for monitor thread
         self.monitor_thread.join()
+
+        signal.set_wakeup_fd(old_wakeup)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        os.close(sig_r)
+        os.close(sig_w)
+        self._sig_r = None
         
     def shutdown_all(self):
         """Tắt tất cả processes"""
         print("\nShutting down all processes...")
-        
+
+        try:
+            self.shutdown_all_pidfd()
+        except (AttributeError, OSError):
+            self.shutdown_all_serial()
+
+        print("\n✓ All processes stopped.")
+
+    def shutdown_all_pidfd(self):
+        """SIGTERM tất cả cùng lúc, chờ chung 5s qua epoll, SIGKILL phần còn lại"""
+        alive = [p for p in self.processes if self.proc_poll(p) is None]
+        if any(p['pidfd'] is None for p in alive):
+            raise OSError("pidfd not available")
+
+        for p_info in alive:
+            os.kill(p_info['pid'], signal.SIGTERM)
+            print(f"✓ Terminated Process {p_info['id']} (PID: {p_info['pid']})")
+
+        if not alive:
+            return
+
+        # Một epoll chờ tất cả → tổng wall-time tối đa 5s bất kể số process
+        epoll = select.epoll()
+        fd_map = {}
+        for p_info in alive:
+            epoll.register(p_info['pidfd'], select.EPOLLIN)
+            fd_map[p_info['pidfd']] = p_info
+
+        deadline = time.monotonic() + 5
+        try:
+            while fd_map:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                for fd, _ in epoll.poll(timeout=timeout):
+                    p_info = fd_map.pop(fd)
+                    self.proc_poll(p_info)
+                    epoll.unregister(fd)
+                    os.close(fd)
+                    p_info['pidfd'] = None
+
+            # Quá hạn → kill thẳng qua pidfd
+            for fd, p_info in fd_map.items():
+                print(f"⚠ Force killing Process {p_info['id']}")
+                signal.pidfd_send_signal(fd, signal.SIGKILL)
+                epoll.unregister(fd)
+                os.close(fd)
+                p_info['pidfd'] = None
+                self.proc_poll(p_info)
+        finally:
+            epoll.close()
+
+    def shutdown_all_serial(self):
+        """Fallback khi không có pidfd"""
         for p_info in self.processes:
             try:
-                process = p_info['process']
-                if process.poll() is None:  # Nếu process vẫn đang chạy
-                    process.terminate()
-                    print(f"✓ Terminated Process {p_info['id']} (PID: {process.pid})")
-                    
+                if self.proc_poll(p_info) is None:  # Nếu process vẫn đang chạy
+                    os.kill(p_info['pid'], signal.SIGTERM)
+                    print(f"✓ Terminated Process {p_info['id']} (PID: {p_info['pid']})")
+
                     # Đợi process kết thúc
-                    try:
-                        process.wait(timeout=5)
-                    except subprocess.TimeoutExpired:
-                        print(f"⚠ Force killing Process {p_info['id']}")
-                        process.kill()
+                    deadline = time.monotonic() + 5
+                    while self.proc_poll(p_info) is None:
+                        if time.monotonic() >= deadline:
+                            print(f"⚠ Force killing Process {p_info['id']}")
+                            os.kill(p_info['pid'], signal.SIGKILL)
+                            break
+                        time.sleep(0.1)
             except Exception as e:
                 print(f"✗ Error shutting down Process {p_info['id']}: {e}")
-        
-        print("\n✓ All processes stopped.")
     
     def show_logs(self):
         """Hiển thị thông tin về log files"""
@@ -259,15 +636,25 @@ class ProcessLauncher:
         print("LOG FILES")
         print("="*60)
         
-        log_files = sorted(Path('logs').glob('process_*.log'))
-        
+        # Thư mục chưa đổi mtime → dùng lại list đã scan
+        dir_mtime = os.stat('logs').st_mtime_ns
+        if dir_mtime == self._logs_mtime:
+            log_files = self._logs_cache
+        else:
+            with os.scandir('logs') as it:
+                log_files = sorted(
+                    (entry.name, entry.stat(follow_symlinks=False).st_size)
+                    for entry in it
+                    if entry.name.startswith('process_') and entry.name.endswith('.log')
+                )
+            self._logs_mtime, self._logs_cache = dir_mtime, log_files
+
         if not log_files:
             print("No log files found.")
             return
-        
-        for log_file in log_files:
-            size = log_file.stat().st_size
-            print(f"{log_file.name:<20} {size:>10} bytes")
+
+        for name, size in log_files:
+            print(f"{name:<20} {size:>10} bytes")
         
         print(f"\nTotal log files: {len(log_files)}")
         print("="*60)
@@ -286,11 +673,10 @@ def main():
     # Khởi động tất cả processes
     if launcher.launch_all():
         # Giám sát processes
-        # launcher.monitor_processes()
-        
+        launcher.monitor_processes()
+
         # Hiển thị thông tin log
         # launcher.show_logs()
-        pass
     else:
         print("\n✗ Failed to launch all processes. Check the errors above.")
         launcher.shutdown_all()
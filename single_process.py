@@ -4,113 +4,191 @@ Single Process for SES Distributed System
 Mỗi process chạy độc lập, gửi và nhận messages
 """
 
+import asyncio
 import socket
 import threading
-import time
 import json
+import heapq
+import queue
+import itertools
 import sys
+import os
+import struct
 import logging
+from logging.handlers import QueueHandler, QueueListener
 import random
+import numpy as np
 from datetime import datetime
-from pathlib import Path
+
+# orjson (Rust, SIMD) parse nhanh hơn json stdlib vài lần — optional
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# io_uring binding — optional, cần Linux >= 5.13 + package liburing
+try:
+    import liburing
+except ImportError:
+    liburing = None
+
+
+def expand_processes(config):
+    """Suy ra config['processes'] từ schema ids/ports (mảng phẳng)"""
+    if 'processes' not in config and 'ids' in config:
+        host = config.get('host', 'localhost')
+        ports = config['ports']
+        config['processes'] = [
+            {'id': i, 'host': host, 'port': ports[i]}
+            for i in config['ids']
+        ]
+    return config
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler nhưng KHÔNG format ở thread gửi
+
+    prepare() gốc gọi self.format(record) ngay tại emit — tức getMessage()
+    và repr các mảng lớn vẫn chạy trên hot path, chỉ có I/O là deferred.
+    Cùng process thì không cần pickle record, enqueue nguyên trạng là đủ;
+    đổi lại args phải là giá trị bất biến hoặc bản copy riêng.
+    """
+    def prepare(self, record):
+        return record
 
 
 class MsgQueue:
     def __init__ (self, num_processes):
-        self.queue = [0] * num_processes
+        # Row i = ràng buộc đã gửi tới P_i; valid[i] nói row i có ràng buộc
+        # thật hay chưa — bitmap tường minh thay vì sentinel "row toàn 0"
+        self.queue = np.zeros((num_processes, num_processes), dtype=np.int64)
+        self.valid = np.zeros(num_processes, dtype=bool)
         self.q_length = num_processes
-        
-        
-    def update_queue_recv(self, pid, other_queue):
-        for i in range(self.q_length):
-            if i != pid:
-                self.queue[i] = self.vector_merge(self.queue[i], other_queue[i])
 
-        
+    def update_queue_recv(self, pid, other_queue, other_valid):
+        # Merge mọi row trừ row của chính mình — 1 np.maximum thay vì
+        # N vòng lặp Python
+        other = np.asarray(other_queue, dtype=np.int64)
+        mask = np.arange(self.q_length) != pid
+        self.queue[mask] = np.maximum(self.queue[mask], other[mask])
+        self.valid[mask] |= np.asarray(other_valid, dtype=bool)[mask]
+
     def update_queue_send(self, target_pid, vector_clock):
-        temp = self.vector_merge(self.queue[target_pid], vector_clock)
-        self.queue[target_pid] = temp
-    
-    @staticmethod
-    def vector_merge(v1, v2):
-        if v1 == 0:
-            return v2
-        elif v2 == 0:
-            return v1
-        return [max(a, b) for a, b in zip(v1, v2)]
-        
-                
-    
+        np.maximum(self.queue[target_pid], vector_clock,
+                   out=self.queue[target_pid])
+        self.valid[target_pid] = True
+
+
 class VectorClock:
     """Vector Clock implementation"""
     def __init__(self, num_processes, process_id):
-        self.vector = [0] * num_processes
+        self.vector = np.zeros(num_processes, dtype=np.int64)
         self.process_id = process_id
         self.num_processes = num_processes
         self.msg_queue = MsgQueue(num_processes)
-    
-    def increment(self):
-        """Tăng clock của process hiện tại"""
+
+    def tick_and_snapshot(self, target_pid):
+        """Tăng clock, chụp (ts, queue) và ghi nhận lần gửi — 1 lần vào lock
+
+        Gộp increment + copy + update_queue_send, caller chỉ giữ clock_lock
+        một lần. Queue copy lấy TRƯỚC khi cập nhật row của target: message
+        không được mang ràng buộc về chính nó, nếu không receiver sẽ chờ
+        VC[sender] >= ts của chính message đó mãi mãi.
+        """
         self.vector[self.process_id] += 1
-    
-    def update(self, msg):
-        """Cập nhật clock khi nhận message (element-wise max)"""
-        for i in range(self.num_processes):
-            if i != self.process_id:
-                self.vector[i] = max(self.vector[i], msg.timestamp[i])
+        ts = self.vector.copy()
+        q = self.msg_queue.queue.copy()
+        valid = self.msg_queue.valid.copy()
+        self.msg_queue.update_queue_send(target_pid, self.vector)
+        return ts, q, valid
+
+    def update_inplace(self, msg):
+        """Cập nhật clock khi nhận message (element-wise max, vectorized)
+
+        Chỉ gồm vài thao tác NumPy in-place — giữ critical section
+        của clock_lock ở mức µs, logging để caller lo sau khi nhả lock
+        """
+        ts = np.asarray(msg.timestamp, dtype=np.int64)
+        # Max không cần mask: chỉ chính mình tăng VC[pid] nên
+        # ts[pid] <= vector[pid] luôn đúng — slot của mình tự trội
+        assert ts[self.process_id] <= self.vector[self.process_id], \
+            "sender knows a newer local clock than us?"
+        np.maximum(self.vector, ts, out=self.vector)
         # Tăng clock của chính mình
         self.vector[self.process_id] += 1
-        
+
         # Cập nhật msg queue
-        self.msg_queue.update_queue_recv(self.process_id, msg.msg_queue)
-        
-    
+        self.msg_queue.update_queue_recv(self.process_id, msg.msg_queue,
+                                         msg.msg_queue_valid)
+
     def vector_clock_copy(self):
         """Trả về bản copy của vector"""
         return self.vector.copy()
-    def msg_queue_copy(self):   
+    def msg_queue_copy(self):
         return self.msg_queue.queue.copy()
-    
+
     def __str__(self):
         return str(self.vector)
 
 class Message:
     """Message class với timestamp"""
-    def __init__(self, sender_id, receiver_id, content, timestamp,msg_queue,msg_number):
+    # Wire format: [len u32][sender i32][receiver i32][msg_number i32]
+    #              [timestamp N×i64 LE][msg_queue N²×i64 LE]
+    #              [valid N×u8][content utf-8]
+    # Mảng đi little-endian (native): tobytes() là memcpy thẳng từ buffer,
+    # không byteswap từng phần tử
+    HEADER = struct.Struct('!iii')
+
+    def __init__(self, sender_id, receiver_id, content, timestamp,
+                 msg_queue, msg_queue_valid, msg_number):
         self.sender_id = sender_id
         self.receiver_id = receiver_id
         self.content = content
         self.timestamp = timestamp  # Vector clock
         self.msg_queue = msg_queue
-        
+        self.msg_queue_valid = msg_queue_valid
+
         self.msg_number = msg_number
         self.arrival_time = datetime.now()
-        
-    
-    def to_dict(self):
-        """Convert message to dictionary for JSON serialization"""
-        return {
-            'sender_id': self.sender_id,
-            'receiver_id': self.receiver_id,
-            'content': self.content,
-            'timestamp': self.timestamp,
-            'msg_queue': self.msg_queue,
-            'msg_number': self.msg_number
-        }
-    
+
+
+    def pack(self):
+        """Serialize thành binary frame có length prefix"""
+        ts = np.ascontiguousarray(self.timestamp, dtype='<i8')
+        queue = np.ascontiguousarray(self.msg_queue, dtype='<i8')
+        valid = np.ascontiguousarray(self.msg_queue_valid, dtype=np.uint8)
+        body = b''.join((
+            self.HEADER.pack(self.sender_id, self.receiver_id, self.msg_number),
+            ts.tobytes(),
+            queue.tobytes(),
+            valid.tobytes(),
+            self.content.encode('utf-8'),
+        ))
+        return struct.pack('!I', len(body)) + body
+
     @staticmethod
-    def from_dict(data):
-        """Create message from dictionary"""
-        msg = Message(
-            data['sender_id'],
-            data['receiver_id'],
-            data['content'],
-            data['timestamp'],
-            data['msg_queue'],
-            data['msg_number']
-        )
-        return msg
-    
+    def unpack(buf, num_processes):
+        """Parse binary frame (không tính length prefix) thành Message"""
+        n = num_processes
+        sender_id, receiver_id, msg_number = Message.HEADER.unpack_from(buf, 0)
+        offset = Message.HEADER.size
+        # frombuffer map thẳng bytes → array, không tokenize
+        timestamp = np.frombuffer(
+            buf, dtype='<i8', count=n, offset=offset
+        ).astype(np.int64)
+        offset += n * 8
+        msg_queue = np.frombuffer(
+            buf, dtype='<i8', count=n * n, offset=offset
+        ).astype(np.int64).reshape(n, n)
+        offset += n * n * 8
+        msg_queue_valid = np.frombuffer(
+            buf, dtype=np.uint8, count=n, offset=offset
+        ).astype(bool)
+        offset += n
+        content = bytes(buf[offset:]).decode('utf-8')
+        return Message(sender_id, receiver_id, content,
+                       timestamp, msg_queue, msg_queue_valid, msg_number)
+
     def __str__(self):
         return f"Msg#{self.msg_number} P{self.sender_id} → P{self.receiver_id}"
 
@@ -125,8 +203,12 @@ class Process:
         self.vector_clock = VectorClock(self.num_processes, process_id)
         self.clock_lock = threading.Lock()
         
-        # Message management
-        self.message_buffer = []  # Messages chờ deliver
+        # Message management — buffer index theo entry k đang chặn:
+        # _blocked_on[k] là min-heap (threshold, seq, msg); message chỉ được
+        # recheck khi VC[k] chạm threshold, không quét cả buffer mỗi lần
+        self._blocked_on = [[] for _ in range(self.num_processes)]
+        self._buffered_count = 0
+        self._buffer_seq = itertools.count()  # tie-break cho heap
         self.buffer_lock = threading.Lock()
         self.delivered_messages = []
         self.delivered_lock = threading.Lock()
@@ -145,18 +227,20 @@ class Process:
         self.host = config['processes'][process_id]['host']
         self.port = config['processes'][process_id]['port']
         self.expected_msg = config['messages_per_process'] * (self.num_processes -1) * 2
-        self.server_socket = None
-        
-        # Threading
-        self.sender_threads = []
-        self.receiver_thread = None
+        self.server = None
+        self._uring_sock = None
+        # 1 connection mở sẵn cho mỗi target, không connect lại từng message
+        self.out_socks = {}
+        self._conn_tasks = set()  # tasks của các connection đã accept
+
         self.running = True
         
         # Logging
         self.setup_logging()
         
-        # Message counter for each target process
-        self.sent_count = {i: 0 for i in range(self.num_processes) if i != self.process_id}
+        # Message counter for each target process — mảng phẳng thay dict,
+        # index là 1 op C thay vì hash; slot của chính mình luôn 0
+        self.sent_count = np.zeros(self.num_processes, dtype=np.int64)
         
         
     
@@ -176,93 +260,181 @@ class Process:
         ch = logging.StreamHandler()
         ch.setLevel(logging.INFO)
         
-        # Formatter
+        # Formatter — epoch thô (%(created).6f) thay cho asctime:
+        # không localtime+strftime mỗi record, cần giờ người đọc thì
+        # convert lúc xem log
         formatter = logging.Formatter(
-            '[%(asctime)s.%(msecs)03d] [%(levelname)s] %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
+            '[%(created).6f] [%(levelname)s] %(message)s'
         )
         fh.setFormatter(formatter)
         ch.setFormatter(formatter)
-        
-        self.logger.addHandler(fh)
-        self.logger.addHandler(ch)
-        
-        self.logger.info(f"Process {self.process_id} initialized")
-        self.logger.info(f"Vector Clock: {self.vector_clock}")
+
+        # Hot path chỉ enqueue record (DeferredQueueHandler không format
+        # tại emit); format + I/O chạy ở listener thread riêng nên disk
+        # stall không chặn critical section
+        self._log_queue = queue.SimpleQueue()
+        self.logger.addHandler(DeferredQueueHandler(self._log_queue))
+        self._log_listener = QueueListener(
+            self._log_queue, fh, ch, respect_handler_level=True
+        )
+        self._log_listener.start()
+
+        self.logger.info("Process %d initialized", self.process_id)
+        # str() ngay tại đây — record format deferred, truyền object sống
+        # là log ra trạng thái lúc listener chạy chứ không phải lúc emit
+        self.logger.info("Vector Clock: %s", str(self.vector_clock))
     
-    def start_server(self):
-        """Khởi động server socket để nhận messages"""
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        
+    async def start_server(self):
+        """Khởi động server nhận messages (io_uring nếu bật, mặc định asyncio)"""
+        if liburing is not None and self.config.get('use_iouring'):
+            try:
+                self._start_server_iouring()
+                return
+            except OSError:
+                self.logger.warning(
+                    "io_uring unavailable, falling back to asyncio server")
         try:
-            self.server_socket.bind((self.host, self.port))
-            self.server_socket.listen(20)
+            self.server = await asyncio.start_server(
+                self.handle_connection, self.host, self.port,
+                reuse_address=True
+            )
             self.logger.info(f"Server started on {self.host}:{self.port}")
-            
-            # Bắt đầu receiver thread
-            self.receiver_thread = threading.Thread(target=self.receiver_loop, daemon=True)
-            self.receiver_thread.start()
-            
         except Exception as e:
             self.logger.error(f"Failed to start server: {e}")
             raise
-    
-    def receiver_loop(self):
-        """Thread nhận messages từ các processes khác"""
-        self.logger.info("Receiver thread started")
-        
-        while self.running:
-            try:
-                self.server_socket.settimeout(2.0)
-                client_socket, addr = self.server_socket.accept()
-                
-                # Xử lý connection trong thread riêng
-                handler_thread = threading.Thread(
-                    target=self.handle_connection,
-                    args=(client_socket,),
-                    daemon=True
-                )
-                handler_thread.start()
-                
-            except socket.timeout:
-                continue
-            except Exception as e:
-                if self.running:
-                    self.logger.error(f"Receiver error: {e}")
-    
-    def handle_connection(self, client_socket):
-        """Xử lý một connection từ sender"""
-        data = b""
-        while True:
-            chunk = client_socket.recv(4096)
-            if not chunk:
-                break
-            data += chunk
-            if len(data) > 1024 * 1024:  # Max 1MB
-                break
-        
-        if data:
-            msg_dict = json.loads(data.decode('utf-8'))
-            msg = Message.from_dict(msg_dict)
-            
-            # Xử lý message
-            client_socket.sendall(b"ACK")
-            self.receive_message(msg)
-                
+
+    def _start_server_iouring(self):
+        """Mở listen socket và chạy ring loop trong 1 thread riêng"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(self.num_processes)
+        self._uring_sock = sock
+        threading.Thread(
+            target=self._serve_iouring, args=(sock,), daemon=True
+        ).start()
+        self.logger.info(f"io_uring server started on {self.host}:{self.port}")
+
+    def _serve_iouring(self, listen_sock):
+        """Vòng nhận qua io_uring: multishot accept + per-fd recv
+
+        Accept và recv completions reap chung trong 1 io_uring_wait_cqe —
+        1 lần io_uring_enter cho cả batch thay vì 1 syscall mỗi accept/recv.
+        Frame ghép từ stream theo length prefix giống handle_connection.
+        """
+        ring = liburing.io_uring()
+        liburing.io_uring_queue_init(256, ring, 0)
+
+        listen_fd = listen_sock.fileno()
+        recv_bufs = {}   # fd -> bytearray 64K tái dùng cho mỗi recv
+        pending = {}     # fd -> bytes đang chờ đủ frame
+
+        def arm_recv(fd):
+            sqe = liburing.io_uring_get_sqe(ring)
+            liburing.io_uring_prep_recv(sqe, fd, recv_bufs[fd],
+                                        len(recv_bufs[fd]), 0)
+            sqe.user_data = fd
+
+        try:
+            # Multishot: 1 SQE đẻ ra CQE cho mọi accept về sau
+            sqe = liburing.io_uring_get_sqe(ring)
+            liburing.io_uring_prep_multishot_accept(sqe, listen_fd, 0, 0, 0)
+            sqe.user_data = listen_fd
+            liburing.io_uring_submit(ring)
+
+            cqe = liburing.io_uring_cqe()
+            while self.running:
+                liburing.io_uring_wait_cqe(ring, cqe)
+                fd, res = cqe.user_data, cqe.res
+                liburing.io_uring_cqe_seen(ring, cqe)
+
+                if fd == listen_fd:
+                    if res >= 0:
+                        recv_bufs[res] = bytearray(65536)
+                        pending[res] = bytearray()
+                        arm_recv(res)
+                        liburing.io_uring_submit(ring)
+                    continue
+
+                if res <= 0:  # peer đóng hoặc lỗi
+                    os.close(fd)
+                    recv_bufs.pop(fd, None)
+                    pending.pop(fd, None)
+                    continue
+
+                data = pending[fd]
+                data += recv_bufs[fd][:res]
+                # Tách mọi frame hoàn chỉnh đã gom đủ
+                while len(data) >= 4:
+                    frame_len, = struct.unpack_from('!I', data, 0)
+                    if len(data) < 4 + frame_len:
+                        break
+                    msg = Message.unpack(data[4:4 + frame_len],
+                                         self.num_processes)
+                    del data[:4 + frame_len]
+                    self.receive_message(msg)
+                arm_recv(fd)
+                liburing.io_uring_submit(ring)
+        finally:
+            for fd in recv_bufs:
+                os.close(fd)
+            liburing.io_uring_queue_exit(ring)
+
+    async def handle_connection(self, reader, writer):
+        """Xử lý một connection persistent: đọc từng frame tới khi peer đóng"""
+        # Track task để _amain cancel + drain được lúc teardown
+        task = asyncio.current_task()
+        self._conn_tasks.add(task)
+        task.add_done_callback(self._conn_tasks.discard)
+
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            while self.running:
+                try:
+                    header = await reader.readexactly(4)
+                    frame_len, = struct.unpack('!I', header)
+                    buf = await reader.readexactly(frame_len)
+                except (asyncio.IncompleteReadError, ConnectionResetError):
+                    break
+                except asyncio.CancelledError:
+                    # Teardown từ _amain — kết thúc bình thường, để task
+                    # cancelled thì callback của StreamReaderProtocol gọi
+                    # task.exception() và in traceback vô nghĩa
+                    break
+
+                msg = Message.unpack(buf, self.num_processes)
+
+                # Xử lý message
+                self.receive_message(msg)
+        finally:
+            writer.close()
+
     
     def receive_message(self, msg):
         """Xử lý message nhận được"""
         with self.stats_lock:
             self.stats['received'] += 1
         
-        self.logger.info(f"[RECEIVED] {msg} with TS={msg.timestamp}, MSG_QUEUE={msg.msg_queue}")
-        old_msq_queue = self.vector_clock.msg_queue.queue.copy()
-        # Cập nhật msg queue nhận
-        self.vector_clock.msg_queue.update_queue_recv(self.process_id, msg.msg_queue)
-        self.logger.info(f"MSG_queue update: {old_msq_queue} →  {self.vector_clock.msg_queue.queue}")
-        
-        
+        # %s-style: formatting (repr 2 mảng lớn) deferred sang listener thread
+        self.logger.info("[RECEIVED] %s with TS=%s, MSG_QUEUE=%s",
+                         msg, msg.timestamp, msg.msg_queue)
+        # Cập nhật msg queue nhận — chỉ merge dưới lock; copy before/after
+        # chỉ khi DEBUG bật, bình thường khỏi tốn 2 bản copy mỗi message
+        log_queues = self.logger.isEnabledFor(logging.DEBUG)
+        with self.clock_lock:
+            if log_queues:
+                old_msq_queue = self.vector_clock.msg_queue.queue.copy()
+            self.vector_clock.msg_queue.update_queue_recv(
+                self.process_id, msg.msg_queue, msg.msg_queue_valid)
+            if log_queues:
+                new_msg_queue = self.vector_clock.msg_queue.queue.copy()
+        if log_queues:
+            self.logger.debug("MSG_queue update: %s →  %s",
+                              old_msq_queue, new_msg_queue)
+
+
         # Kiểm tra điều kiện delivery
         if self.can_deliver(msg):
             self.deliver_message(msg)
@@ -271,42 +443,39 @@ class Process:
         else:
             self.buffer_message(msg)
     
-    def compare_bigger_equal(self, v1, v2):
-        for a, b in zip(v1, v2):
-            if a < b:
-                return False
-        return True
-    
     def can_deliver(self, msg):
-        msg_queue = msg.msg_queue
-        
-        with self.clock_lock:
-            vc = self.vector_clock.vector
-            # compare current clock with msg_queue
-            if msg_queue[self.process_id] == 0: 
-                return True
-            else:
-                if not self.compare_bigger_equal(vc, msg_queue[self.process_id]):
-                    self.logger.debug(
-                        f"Cannot deliver {msg}: VC={vc} < MSG_QUEUE[{self.process_id}]={msg_queue[self.process_id]}"
-                    )
-                    return False
+        # 1 bool load: chưa có ràng buộc cho mình thì deliver luôn
+        if not msg.msg_queue_valid[self.process_id]:
             return True
+        row = msg.msg_queue[self.process_id]
+
+        # compare current clock with msg_queue — 1 lần SIMD compare+reduce
+        # thay vì branch Python từng phần tử
+        with self.clock_lock:
+            deliverable = bool((self.vector_clock.vector >= row).all())
+            # copy vì format chạy deferred, vector có thể đổi trước khi log
+            vc = (None if deliverable or not self.logger.isEnabledFor(logging.DEBUG)
+                  else self.vector_clock.vector.copy())
+        if vc is not None:
+            self.logger.debug("Cannot deliver %s: VC=%s < MSG_QUEUE[%d]=%s",
+                              msg, vc, self.process_id, row)
+        return deliverable
     
     
     def log_progress (self):
         with self.file_lock:
-            file_name = f"temp_status/P{self.process_id}.txt"
-            # Tạo bản ghi mới
+            file_name = f"temp_status/P{self.process_id}.bin"
+            tmp_name = file_name + ".tmp"
             vector_clock = self.vector_clock.vector
-            msg_queue= self.vector_clock.msg_queue.queue
-            
-            percent = round(vector_clock[self.process_id] * 100 / self.expected_msg)
-            # Ghi lại vào file
-            with open(file_name, "w") as f:
-                f.write(str(vector_clock) + "\n")
-                f.write(str(msg_queue) + "\n")
-                f.write(f"{percent}% completed\n")
+
+            # Bản ghi binary cố định: count + N doubles, reader seek O(1)
+            record = struct.pack(
+                '<I' + 'd' * self.num_processes,
+                self.num_processes, *vector_clock
+            )
+            with open(tmp_name, "wb") as f:
+                f.write(record)
+            os.replace(tmp_name, file_name)  # atomic swap
 
         
     
@@ -314,7 +483,7 @@ class Process:
         """Deliver message và cập nhật vector clock"""
         with self.clock_lock:
             old_vc = self.vector_clock.vector_clock_copy()
-            self.vector_clock.update(msg)
+            self.vector_clock.update_inplace(msg)
             new_vc = self.vector_clock.vector_clock_copy()
         
         with self.delivered_lock:
@@ -323,68 +492,75 @@ class Process:
         with self.stats_lock:
             self.stats['delivered'] += 1
         
-        self.logger.info(
-            f"[✓ DELIVERED] {msg}, VC: {old_vc} → {new_vc}"
-        )
+        self.logger.info("[✓ DELIVERED] %s, VC: %s → %s", msg, old_vc, new_vc)
         
         self.log_progress()
     
+    def _file_blocked(self, msg):
+        """Xếp msg vào heap của entry k đầu tiên đang chặn nó (caller giữ buffer_lock)"""
+        row = msg.msg_queue[self.process_id]
+        with self.clock_lock:
+            blocked = np.nonzero(row > self.vector_clock.vector)[0]
+        k = int(blocked[0]) if blocked.size else int(msg.sender_id)
+        heapq.heappush(
+            self._blocked_on[k],
+            (int(row[k]), next(self._buffer_seq), msg)
+        )
+        return k
+
     def buffer_message(self, msg):
         """Đưa message vào buffer"""
         with self.buffer_lock:
-            self.message_buffer.append(msg)
-        
+            k = self._file_blocked(msg)
+            self._buffered_count += 1
+
         with self.stats_lock:
             self.stats['buffered'] += 1
-        
-        # Tìm lý do buffer
-        sender = msg.sender_id
-        ts = msg.timestamp
-        with self.clock_lock:
-            vc = self.vector_clock.vector
-            
-            reasons = []
-            if vc[sender] != ts[sender] - 1:
-                reasons.append(f"VC[{sender}]={vc[sender]} != TS[{sender}]-1={ts[sender]-1}")
-            
-            for k in range(self.num_processes):
-                if k != sender and vc[k] < ts[k]:
-                    reasons.append(f"VC[{k}]={vc[k]} < TS[{k}]={ts[k]}")
-        
-        self.logger.warning(
-            f"⏸ BUFFERED {msg}"
-        )
+
+        self.logger.warning("⏸ BUFFERED %s (chờ VC[%d])", msg, k)
     
     def try_deliver_buffered(self):
-        """Thử deliver các messages trong buffer"""
+        """Thử deliver các messages trong buffer
+
+        Chỉ pop messages có threshold đã được VC vượt qua — message bị
+        chặn bởi entry khác không bị rescan. Message pop ra mà vẫn chưa
+        deliver được thì xếp lại vào heap của entry chặn mới.
+        """
         with self.buffer_lock:
-            if not self.message_buffer:
+            if not self._buffered_count:
                 return
-            
-            # Sắp xếp buffer theo timestamp của sender
-            self.message_buffer.sort(key=lambda m: (m.sender_id, m.timestamp[m.sender_id]))
-            
-            delivered = []
-            for msg in self.message_buffer[:]:
-                if self.can_deliver(msg):
-                    self.deliver_message(msg)
-                    delivered.append(msg)
-                    self.message_buffer.remove(msg)
-            
-            if delivered:
+
+            total_delivered = 0
+            progress = True
+            while progress:
+                progress = False
+                with self.clock_lock:
+                    vc = self.vector_clock.vector.copy()
+                for k in range(self.num_processes):
+                    heap = self._blocked_on[k]
+                    while heap and heap[0][0] <= vc[k]:
+                        _, _, msg = heapq.heappop(heap)
+                        if self.can_deliver(msg):
+                            self.deliver_message(msg)
+                            self._buffered_count -= 1
+                            total_delivered += 1
+                            progress = True
+                        else:
+                            self._file_blocked(msg)
+
+            if total_delivered:
                 self.logger.info(
-                    f"✓ UNBUFFERED and delivered {len(delivered)} message(s), "
-                    f"buffer size: {len(self.message_buffer)}"
+                    "✓ UNBUFFERED and delivered %d message(s), buffer size: %d",
+                    total_delivered, self._buffered_count
                 )
     
-    def send_message(self, target_id, content):
+    async def send_message(self, target_id, content):
         """Gửi message tới process khác"""
-        # Increment vector clock
+        # Increment + snapshot + cập nhật queue gửi trong 1 critical section
         with self.clock_lock:
-            self.vector_clock.increment()
-            timestamp = self.vector_clock.vector_clock_copy()
+            timestamp, msg_queue, queue_valid = \
+                self.vector_clock.tick_and_snapshot(target_id)
 
-            
         # Tạo message
         self.sent_count[target_id] += 1
         msg = Message(
@@ -392,135 +568,153 @@ class Process:
             target_id,
             content,
             timestamp,
-            self.vector_clock.msg_queue_copy(),
+            msg_queue,
+            queue_valid,
             self.sent_count[target_id]
         )
-        # update msg queue
-        self.vector_clock.msg_queue.update_queue_send(target_id, timestamp)
         self.log_progress()
-        
-        # Gửi qua socket
-        target_info = self.config['processes'][target_id]
-        target_host = target_info['host']
-        target_port = target_info['port']
-        
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(10.0)
-        sock.connect((target_host, target_port))
-        
-        # Serialize và gửi
-        msg_json = json.dumps(msg.to_dict())
-        sock.sendall(msg_json.encode('utf-8'))
-        sock.shutdown(socket.SHUT_WR) #signal that sending is done
-        # Đợi ACK
-        ack = sock.recv(1024)
-        # print (f"!!!!!!received ack: {ack}")
-        if ack != b"ACK":
-            self.logger.error(f"No ACK received for message to P{target_id}")
-        else:
-            self.logger.info(f"[→ SENT] {msg}, TS={timestamp}, queue={msg.msg_queue}")
-            
-        sock.close()
+
+        # Gửi qua connection mở sẵn
+        writer = await self._get_conn(target_id)
+
+        # Serialize và gửi — binary frame, không JSON encode.
+        # Không chờ ACK: TCP đã đảm bảo delivery, SES tự lo thứ tự qua buffer
+        try:
+            writer.write(msg.pack())
+            await writer.drain()
+        except OSError:
+            self._drop_conn(target_id)
+            raise
+        self.logger.info("[→ SENT] %s, TS=%s, queue=%s",
+                         msg, timestamp, msg.msg_queue)
+
         with self.stats_lock:
             self.stats['sent'] += 1
 
+    async def _get_conn(self, target_id):
+        """Lấy (hoặc mở) connection persistent tới target"""
+        writer = self.out_socks.get(target_id)
+        if writer is not None and not writer.is_closing():
+            return writer
+
+        target_info = self.config['processes'][target_id]
+        reader, writer = await asyncio.open_connection(
+            target_info['host'], target_info['port']
+        )
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            # NODELAY: messages nhỏ đi ngay, không dính 40ms Nagle stall
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self.out_socks[target_id] = writer
+        return writer
+
+    def _drop_conn(self, target_id):
+        """Đóng và bỏ connection hỏng khỏi cache"""
+        writer = self.out_socks.pop(target_id, None)
+        if writer is not None:
+            writer.close()
+
     
-    def sender_thread_func(self, target_id):
-        """Thread gửi messages tới một process cụ thể"""
+    async def sender_loop(self, target_id):
+        """Coroutine gửi messages tới một process cụ thể"""
         messages_to_send = self.config['messages_per_process']
         min_rate = self.config['message_rate_min']
         max_rate = self.config['message_rate_max']
-        
-        self.logger.info(f"Sender thread started for P{target_id}")
-        
+
+        self.logger.info(f"Sender started for P{target_id}")
+
         # Đợi một chút để tất cả processes khởi động
-        time.sleep(3)
-        
+        await asyncio.sleep(3)
+
         for i in range(messages_to_send):
             if not self.running:
                 break
-            
+
             # Gửi message
             content = f"message {i+1}"
-            self.send_message(target_id, content)
-            
+            await self.send_message(target_id, content)
+
             # Random delay dựa trên message rate
             rate = random.uniform(min_rate, max_rate)
             delay = 60.0 / rate  # Convert messages/minute to seconds
-            time.sleep(delay)
-            # time.sleep(2)
-        
-        self.logger.info(f"Sender thread completed for P{target_id}")
-    
-            
-    def shake_hands(self, retry_interval=2.0):
+            await asyncio.sleep(delay)
+
+        self.logger.info(f"Sender completed for P{target_id}")
+
+
+    async def shake_hands(self, retry_interval=2.0):
         """
         Liên tục thử kết nối đến tất cả process khác
         retry_interval: thời gian (s) giữa các lần thử
+
+        Connection mở được giữ luôn trong out_socks (_get_conn) làm
+        connection gửi — không đóng rồi connect lại lần gửi đầu tiên
         """
         for target_id in range(self.num_processes):
             if target_id == self.process_id:
                 continue
 
-            target_info = self.config['processes'][target_id]
-            target_host = target_info['host']
-            target_port = target_info['port']
-
             connected = False
             while not connected:
                 try:
-                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    sock.settimeout(5.0)
-                    sock.connect((target_host, target_port))
+                    await self._get_conn(target_id)
                     self.logger.info(f"Handshake successful with P{target_id}")
                     connected = True
-                except Exception as e:
+                except OSError:
                     self.logger.warning(f"Cannot connect to P{target_id}, retrying in {retry_interval}s...")
-                    time.sleep(retry_interval)
-    
-    def start_senders(self):
-        
-        """Khởi động tất cả sender threads"""
-        for target_id in range(self.num_processes):
-            if target_id == self.process_id:
-                continue
-            
-            thread = threading.Thread(
-                target=self.sender_thread_func,
-                args=(target_id,),
-                daemon=True
-            )
-            thread.start()
-            self.sender_threads.append(thread)
-        
-        self.logger.info(f"Started {len(self.sender_threads)} sender threads")
-        
-    # def wait_others(self):
-        
-    
+                    await asyncio.sleep(retry_interval)
+
+    async def _amain(self):
+        """Event loop chính: server + tất cả senders trong 1 thread"""
+        # Khởi động server
+        await self.start_server()
+
+        # Thực hiện handshake với tất cả processes khác
+        await self.shake_hands()
+
+        # Mỗi target một coroutine — không thread, không GIL ping-pong
+        senders = [
+            asyncio.create_task(self.sender_loop(target_id))
+            for target_id in range(self.num_processes)
+            if target_id != self.process_id
+        ]
+        self.logger.info(f"Started {len(senders)} sender coroutines")
+
+        await asyncio.gather(*senders)
+
+        # Đợi thêm một chút để nhận messages còn lại
+        self.logger.info("All senders completed, waiting for remaining messages...")
+        await asyncio.sleep(5)
+
+        # In statistics
+        self.print_statistics()
+
+        # Cleanup network phải chạy TRONG loop: StreamWriter.close cần
+        # loop còn sống, gọi sau asyncio.run là RuntimeError
+        for writer in self.out_socks.values():
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionResetError, OSError):
+                pass
+        self.out_socks.clear()
+
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+        # Cancel + drain các connection handler còn treo trên readexactly,
+        # không để loop teardown cancel hộ rồi kêu CancelledError
+        for task in list(self._conn_tasks):
+            task.cancel()
+        if self._conn_tasks:
+            await asyncio.gather(*self._conn_tasks, return_exceptions=True)
+
     def run(self):
         """Chạy process"""
         try:
-            # Khởi động server
-            self.start_server()
-            
-            # Thực hiện handshake với tất cả processes khác
-            self.shake_hands()
-            
-            # Khởi động senders
-            self.start_senders()
-            
-            # Chờ tất cả sender threads hoàn thành
-            for thread in self.sender_threads:
-                thread.join()
-            
-            # Đợi thêm một chút để nhận messages còn lại
-            self.logger.info("All senders completed, waiting for remaining messages...")
-            time.sleep(5)
-            
-            # In statistics
-            self.print_statistics()
-            
+            asyncio.run(self._amain())
         except KeyboardInterrupt:
             self.logger.info("Received interrupt signal")
         except Exception as e:
@@ -534,7 +728,7 @@ class Process:
             stats = self.stats.copy()
         
         with self.buffer_lock:
-            buffer_size = len(self.message_buffer)
+            buffer_size = self._buffered_count
         
         self.logger.info("="*60)
         self.logger.info(f"FINAL STATISTICS of P{self.process_id}")
@@ -551,11 +745,15 @@ class Process:
         """Tắt process"""
         self.logger.info("Shutting down...")
         self.running = False
-        
-        if self.server_socket:
-            self.server_socket.close()
-        
+
+        # Connections đóng trong _amain (cần loop); ở đây chỉ còn phần
+        # không phụ thuộc loop
+        if self._uring_sock is not None:
+            self._uring_sock.close()
+
         self.logger.info("Process terminated")
+        # Flush record còn lại trong queue rồi dừng listener thread
+        self._log_listener.stop()
 
 def main():
     """Main function"""
@@ -568,8 +766,11 @@ def main():
     # Load config
     config_path = "config/config.json"
     try:
-        with open(config_path, 'r') as f:
-            config = json.load(f)
+        with open(config_path, 'rb') as f:
+            raw = f.read()
+        config = expand_processes(
+            orjson.loads(raw) if orjson is not None else json.loads(raw)
+        )
     except FileNotFoundError:
         print(f"Config file not found: {config_path}")
         sys.exit(1)